@@ -1,37 +1,143 @@
 from __future__ import annotations
 
+import eventlet
+
+eventlet.monkey_patch()
+
+from contextlib import ExitStack
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import lru_cache
+import gzip
+import hashlib
+import os
 import random
 import threading
 import time
 from uuid import uuid4
 
-from flask import Flask, jsonify, render_template, request
+import numpy as np
+import orjson
+from flask import Flask, Response, jsonify, make_response, render_template, request
 from flask_socketio import SocketIO, emit
+from socketio.packet import EVENT
 
 
 @dataclass
 class PlayerState:
     player_id: str
     mutations: list[str] = field(default_factory=list)
+    mutations_seen: set[str] = field(default_factory=set)
     biomass: int = 1
     hp: int = 10
-    x: int = 0
-    y: int = 0
     is_bot: bool = False
     display_name: str = "Вы"
-    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    created_at: float = field(default_factory=time.time)
+    # Index into the POS_X/POS_Y/IS_BOT arrays, assigned by add_player().
+    slot: int = -1
+
+    @property
+    def x(self) -> int:
+        return int(POS_X[self.require_slot()])
+
+    @property
+    def y(self) -> int:
+        return int(POS_Y[self.require_slot()])
+
+    def require_slot(self) -> int:
+        if self.slot < 0:
+            raise RuntimeError(f"player {self.player_id} has no slot")
+        return self.slot
+
+
+class ShardedPlayers:
+    """Player registry split into shards with independent locks."""
+
+    def __init__(self, shard_count: int) -> None:
+        # Shard count must be a power of two so the hash can be masked.
+        self.shards: list[tuple[dict[str, PlayerState], threading.Lock]] = [
+            ({}, threading.Lock()) for _ in range(shard_count)
+        ]
+        self._mask = shard_count - 1
+        self._count = 0
+        self._dirty = False
+
+    def shard(self, player_id: str) -> tuple[dict[str, PlayerState], threading.Lock]:
+        return self.shards[hash(player_id) & self._mask]
+
+    def lock_for(self, player_id: str) -> threading.Lock:
+        return self.shard(player_id)[1]
+
+    def get(self, player_id: str) -> PlayerState | None:
+        return self.shard(player_id)[0].get(player_id)
+
+    def set(self, player_id: str, player_state: PlayerState) -> None:
+        players, lock = self.shard(player_id)
+        with lock:
+            players[player_id] = player_state
+        self._dirty = True
+
+    def pop(self, player_id: str) -> PlayerState | None:
+        players, lock = self.shard(player_id)
+        with lock:
+            player_state = players.pop(player_id, None)
+        self._dirty = True
+        return player_state
+
+    def locks_for(self, player_ids: list[str]) -> list[threading.Lock]:
+        # Deduplicated and in shard order, so callers can take them all safely.
+        indexes = sorted({hash(player_id) & self._mask for player_id in player_ids})
+        return [self.shards[index][1] for index in indexes]
+
+    def __contains__(self, player_id: str) -> bool:
+        return player_id in self.shard(player_id)[0]
+
+    def __len__(self) -> int:
+        if self._dirty:
+            self._dirty = False
+            self._count = sum(len(players) for players, _ in self.shards)
+        return self._count
+
+
+def shard_count() -> int:
+    count = 4 * (os.cpu_count() or 1)
+    return 1 << (count - 1).bit_length()
+
+
+class OrjsonCodec:
+    """Drop-in for the ``json`` module used to encode Socket.IO packets."""
+
+    @staticmethod
+    def dumps(obj: object, **kwargs: object) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    @staticmethod
+    def loads(data: str | bytes, **kwargs: object) -> object:
+        return orjson.loads(data)
 
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = "primor-dev"
 
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(
+    app, async_mode="eventlet", cors_allowed_origins="*", json=OrjsonCodec
+)
 
 MAP_WIDTH = 12
 MAP_HEIGHT = 8
 BOT_COUNT = 4
+INITIAL_SLOTS = 1024
+DIRECTION_DELTAS = {
+    "up": (0, -1),
+    "down": (0, 1),
+    "left": (-1, 0),
+    "right": (1, 0),
+}
+DIRECTIONS = tuple(DIRECTION_DELTAS)
+RNG = random.Random()
+BROADCAST_BATCH_SIZE = 50
+INDEX_MAX_AGE = 3600
+MAX_QUEUED_FRAMES = 64
 BOT_NAMES = [
     "Сапрофит",
     "Микроклон",
@@ -41,15 +147,34 @@ BOT_NAMES = [
 ]
 
 GLOBAL_STATE = {
-    "players": 0,
     "global_mutations": {},
     "global_biomass": 0,
     "map": {"width": MAP_WIDTH, "height": MAP_HEIGHT},
 }
 
-PLAYERS: dict[str, PlayerState] = {}
-LOCK = threading.Lock()
-BOT_TASK_STARTED = False
+PLAYERS = ShardedPlayers(shard_count())
+ACTORS_INDEX: dict[str, dict] = {}
+# Player ids bucketed by map cell, indexed as GRID[y][x].
+GRID: list[list[set[str]]] = [
+    [set() for _ in range(MAP_WIDTH)] for _ in range(MAP_HEIGHT)
+]
+# Hot per-player fields stored as arrays indexed by PlayerState.slot.
+# The arrays double in size whenever FREE_SLOTS runs out.
+POS_X = np.zeros(INITIAL_SLOTS, dtype=np.int16)
+POS_Y = np.zeros(INITIAL_SLOTS, dtype=np.int16)
+IS_BOT = np.zeros(INITIAL_SLOTS, dtype=bool)
+SLOT_OWNERS: list[PlayerState | None] = [None] * INITIAL_SLOTS
+FREE_SLOTS = list(range(INITIAL_SLOTS - 1, -1, -1))
+SLOTS_LOCK = threading.Lock()
+# Player owned by each Socket.IO session, so disconnect can free its slot.
+SESSIONS: dict[str, PlayerState] = {}
+STATS_LOCK = threading.Lock()
+# Deltas waiting for the next coalesced broadcast.
+PENDING_DELTAS: list[dict] = []
+OUTBOX_LOCK = threading.Lock()
+FLUSH_SCHEDULED = False
+BOTS_LOCK = threading.Lock()
+BOTS_STARTED = False
 
 EVOLUTION_TREE = {
     "metabolism": {
@@ -157,16 +282,54 @@ EVOLUTION_TREE = {
 }
 
 
+def flatten_tree(tree: dict, path: tuple[str, ...] = ()) -> dict[str, dict]:
+    flat: dict[str, dict] = {}
+    for node_id, node in tree.items():
+        node_path = (*path, node_id)
+        flat[node_id] = {
+            "label": node["label"],
+            "description": node["description"],
+            "path": list(node_path),
+        }
+        flat.update(flatten_tree(node.get("children", {}), node_path))
+    return flat
+
+
+FLAT_TREE = flatten_tree(EVOLUTION_TREE)
+
+
 @app.route("/")
-def index() -> str:
-    return render_template("index.html", evolution_tree=EVOLUTION_TREE)
+def index() -> Response:
+    body, gzipped, etag = render_index()
+    if request.accept_encodings["gzip"]:
+        response = make_response(gzipped)
+        response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(f"{etag}-gzip")
+    else:
+        response = make_response(body)
+        response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.max_age = INDEX_MAX_AGE
+    return response.make_conditional(request)
+
+
+@lru_cache(maxsize=1)
+def render_index() -> tuple[bytes, bytes, str]:
+    # The page only depends on the static evolution tree, so render it once.
+    body = render_template("index.html", evolution_tree=EVOLUTION_TREE).encode()
+    return (
+        body,
+        gzip.compress(body),
+        hashlib.md5(body, usedforsecurity=False).hexdigest(),
+    )
 
 
 @app.route("/api/state")
 def state() -> str:
     return jsonify(
         {
-            "players": GLOBAL_STATE["players"],
+            "players": len(PLAYERS),
             "global_mutations": GLOBAL_STATE["global_mutations"],
             "global_biomass": GLOBAL_STATE["global_biomass"],
             "map": GLOBAL_STATE["map"],
@@ -176,195 +339,408 @@ def state() -> str:
 
 @socketio.on("connect")
 def handle_connect() -> None:
+    start_bots()
     player_id = request.args.get("player") or uuid4().hex
-    with LOCK:
-        player_state = PlayerState(
-            player_id=player_id,
-            x=random.randint(0, MAP_WIDTH - 1),
-            y=random.randint(0, MAP_HEIGHT - 1),
-        )
-        PLAYERS[player_id] = player_state
-        GLOBAL_STATE["players"] = len(PLAYERS)
+    player_state = PlayerState(player_id=player_id)
+    add_player(
+        player_state,
+        RNG.randrange(MAP_WIDTH),
+        RNG.randrange(MAP_HEIGHT),
+    )
+    SESSIONS[request.sid] = player_state
+    with STATS_LOCK:
         GLOBAL_STATE["global_biomass"] += player_state.biomass
-        ensure_bots_running()
+        global_biomass = GLOBAL_STATE["global_biomass"]
     emit("session", {"player": player_id})
-    emit("state", build_state(player_state), broadcast=True)
+    emit("state", build_state(player_state))
+    emit_delta(
+        {
+            "op": "join",
+            "actor": ACTORS_INDEX[player_id],
+            "players": len(PLAYERS),
+            "global_biomass": global_biomass,
+        }
+    )
 
 
 @socketio.on("disconnect")
 def handle_disconnect() -> None:
-    player_id = request.args.get("player")
-    if not player_id or player_id not in PLAYERS:
+    player_state = SESSIONS.pop(request.sid, None)
+    if player_state is None:
+        return
+    # A reconnect under the same id may already have replaced this player.
+    if PLAYERS.get(player_state.player_id) is not player_state:
         return
-    with LOCK:
-        player_state = PLAYERS.pop(player_id)
-        GLOBAL_STATE["players"] = len(PLAYERS)
+    remove_player(player_state.player_id)
+    with STATS_LOCK:
         GLOBAL_STATE["global_biomass"] = max(
             0, GLOBAL_STATE["global_biomass"] - player_state.biomass
         )
-    emit("state", build_state(player_state), broadcast=True)
+        global_biomass = GLOBAL_STATE["global_biomass"]
+    emit_delta(
+        {
+            "op": "leave",
+            "id": player_state.player_id,
+            "players": len(PLAYERS),
+            "global_biomass": global_biomass,
+        }
+    )
 
 
 @socketio.on("mutate")
 def handle_mutate(payload: dict) -> None:
     player_id = payload.get("player")
     mutation = payload.get("mutation")
-    if not player_id or player_id not in PLAYERS or not mutation:
+    if not player_id or not isinstance(mutation, str) or not mutation:
+        return
+    player_state = PLAYERS.get(player_id)
+    if player_state is None:
         return
-    with LOCK:
-        player_state = PLAYERS[player_id]
-        if mutation in player_state.mutations:
+    with PLAYERS.lock_for(player_id):
+        if mutation in player_state.mutations_seen:
             return
+        player_state.mutations_seen.add(mutation)
         player_state.mutations.append(mutation)
         player_state.biomass += 1
         player_state.hp = min(20, player_state.hp + 1)
+        ACTORS_INDEX[player_id]["hp"] = player_state.hp
+    with STATS_LOCK:
         GLOBAL_STATE["global_biomass"] += 1
         GLOBAL_STATE["global_mutations"].setdefault(mutation, 0)
         GLOBAL_STATE["global_mutations"][mutation] += 1
-    emit("state", build_state(player_state), broadcast=True)
+        count = GLOBAL_STATE["global_mutations"][mutation]
+        global_biomass = GLOBAL_STATE["global_biomass"]
+    emit_delta(
+        {
+            "op": "mutate",
+            "id": player_id,
+            "m": mutation,
+            "biomass": player_state.biomass,
+            "hp": player_state.hp,
+            "count": count,
+            "global_biomass": global_biomass,
+        }
+    )
 
 
 @socketio.on("move")
 def handle_move(payload: dict) -> None:
     player_id = payload.get("player")
     direction = payload.get("direction")
-    if not player_id or player_id not in PLAYERS or not direction:
+    if not player_id or not isinstance(direction, str) or not direction:
+        return
+    player_state = PLAYERS.get(player_id)
+    if player_state is None:
         return
-    with LOCK:
-        player_state = PLAYERS[player_id]
+    with PLAYERS.lock_for(player_id):
         dx, dy = direction_to_delta(direction)
-        player_state.x = clamp(player_state.x + dx, 0, MAP_WIDTH - 1)
-        player_state.y = clamp(player_state.y + dy, 0, MAP_HEIGHT - 1)
-    emit("state", build_state(player_state), broadcast=True)
+        place(
+            player_state,
+            clamp(player_state.x + dx, 0, MAP_WIDTH - 1),
+            clamp(player_state.y + dy, 0, MAP_HEIGHT - 1),
+        )
+        sync_actor(player_state)
+    emit_delta(
+        {"op": "move", "id": player_id, "x": player_state.x, "y": player_state.y}
+    )
 
 
 @socketio.on("attack")
 def handle_attack(payload: dict) -> None:
     player_id = payload.get("player")
-    if not player_id or player_id not in PLAYERS:
+    if not player_id:
+        return
+    player_state = PLAYERS.get(player_id)
+    if player_state is None:
         return
-    with LOCK:
-        player_state = PLAYERS[player_id]
-        targets = find_targets(player_state)
-        for target in targets:
+    for target in find_targets(player_state):
+        with PLAYERS.lock_for(target.player_id):
             target.hp -= 2
-            if target.hp <= 0:
+            killed = target.hp <= 0
+            if killed:
                 respawn(target)
+            sync_actor(target)
+        with STATS_LOCK:
+            if killed:
                 GLOBAL_STATE["global_biomass"] = max(
                     0, GLOBAL_STATE["global_biomass"] - 1
                 )
-    emit("state", build_state(player_state), broadcast=True)
+            global_biomass = GLOBAL_STATE["global_biomass"]
+        emit_delta(
+            {
+                "op": "hit",
+                "id": target.player_id,
+                "hp": target.hp,
+                "x": target.x,
+                "y": target.y,
+                "global_biomass": global_biomass,
+            }
+        )
 
 
 def build_state(player_state: PlayerState) -> dict:
+    return {"players": [build_player(player_state)], "world": build_world()}
+
+
+def build_player(player_state: PlayerState) -> dict:
     return {
-        "player": {
-            "id": player_state.player_id,
-            "name": player_state.display_name,
-            "mutations": player_state.mutations,
-            "biomass": player_state.biomass,
-            "hp": player_state.hp,
-            "x": player_state.x,
-            "y": player_state.y,
-            "is_bot": player_state.is_bot,
-            "created_at": player_state.created_at,
-        },
-        "world": {
-            "players": GLOBAL_STATE["players"],
-            "global_mutations": GLOBAL_STATE["global_mutations"],
-            "global_biomass": GLOBAL_STATE["global_biomass"],
-            "map": GLOBAL_STATE["map"],
-            "actors": [
-                {
-                    "id": state.player_id,
-                    "name": state.display_name,
-                    "hp": state.hp,
-                    "x": state.x,
-                    "y": state.y,
-                    "is_bot": state.is_bot,
-                    "mutations": state.mutations,
-                }
-                for state in PLAYERS.values()
-            ],
-        },
+        "id": player_state.player_id,
+        "name": player_state.display_name,
+        "mutations": player_state.mutations,
+        "biomass": player_state.biomass,
+        "hp": player_state.hp,
+        "x": player_state.x,
+        "y": player_state.y,
+        "is_bot": player_state.is_bot,
+        "created_at": datetime.fromtimestamp(
+            player_state.created_at, timezone.utc
+        ).isoformat(),
     }
 
 
+def build_world() -> dict:
+    return {
+        "players": len(PLAYERS),
+        "global_mutations": GLOBAL_STATE["global_mutations"],
+        "global_biomass": GLOBAL_STATE["global_biomass"],
+        "map": GLOBAL_STATE["map"],
+        "actors": list(ACTORS_INDEX.values()),
+    }
+
+
+def add_player(player_state: PlayerState, x: int, y: int) -> None:
+    if player_state.player_id in PLAYERS:
+        remove_player(player_state.player_id)
+    slot = allocate_slot()
+    player_state.slot = slot
+    POS_X[slot] = x
+    POS_Y[slot] = y
+    IS_BOT[slot] = player_state.is_bot
+    SLOT_OWNERS[slot] = player_state
+    PLAYERS.set(player_state.player_id, player_state)
+    GRID[player_state.y][player_state.x].add(player_state.player_id)
+    ACTORS_INDEX[player_state.player_id] = {
+        "id": player_state.player_id,
+        "name": player_state.display_name,
+        "hp": player_state.hp,
+        "x": player_state.x,
+        "y": player_state.y,
+        "is_bot": player_state.is_bot,
+        # Shared with the player state, so mutations never need syncing.
+        "mutations": player_state.mutations,
+    }
+
+
+def remove_player(player_id: str) -> PlayerState | None:
+    ACTORS_INDEX.pop(player_id, None)
+    player_state = PLAYERS.pop(player_id)
+    if player_state is not None:
+        GRID[player_state.y][player_state.x].discard(player_id)
+        release_slot(player_state.slot)
+    return player_state
+
+
+def allocate_slot() -> int:
+    global POS_X, POS_Y, IS_BOT
+    with SLOTS_LOCK:
+        if not FREE_SLOTS:
+            size = len(SLOT_OWNERS)
+            POS_X = np.concatenate([POS_X, np.zeros(size, dtype=np.int16)])
+            POS_Y = np.concatenate([POS_Y, np.zeros(size, dtype=np.int16)])
+            IS_BOT = np.concatenate([IS_BOT, np.zeros(size, dtype=bool)])
+            SLOT_OWNERS.extend([None] * size)
+            FREE_SLOTS.extend(range(2 * size - 1, size - 1, -1))
+        return FREE_SLOTS.pop()
+
+
+def release_slot(slot: int) -> None:
+    with SLOTS_LOCK:
+        IS_BOT[slot] = False
+        SLOT_OWNERS[slot] = None
+        FREE_SLOTS.append(slot)
+
+
+def place(player_state: PlayerState, x: int, y: int) -> None:
+    old_x, old_y = player_state.x, player_state.y
+    POS_X[player_state.slot] = x
+    POS_Y[player_state.slot] = y
+    update_cell(player_state, old_x, old_y)
+
+
+def update_cell(player_state: PlayerState, old_x: int, old_y: int) -> None:
+    GRID[old_y][old_x].discard(player_state.player_id)
+    GRID[player_state.y][player_state.x].add(player_state.player_id)
+
+
+def sync_actor(player_state: PlayerState) -> None:
+    actor = ACTORS_INDEX.get(player_state.player_id)
+    if actor is None:
+        return
+    actor["hp"] = player_state.hp
+    actor["x"] = player_state.x
+    actor["y"] = player_state.y
+
+
 def clamp(value: int, min_value: int, max_value: int) -> int:
     return max(min_value, min(max_value, value))
 
 
 def direction_to_delta(direction: str) -> tuple[int, int]:
-    mapping = {
-        "up": (0, -1),
-        "down": (0, 1),
-        "left": (-1, 0),
-        "right": (1, 0),
-    }
-    return mapping.get(direction, (0, 0))
+    return DIRECTION_DELTAS.get(direction, (0, 0))
 
 
 def find_targets(player_state: PlayerState) -> list[PlayerState]:
     targets: list[PlayerState] = []
-    for state in PLAYERS.values():
-        if state.player_id == player_state.player_id:
-            continue
-        if abs(state.x - player_state.x) <= 1 and abs(state.y - player_state.y) <= 1:
-            targets.append(state)
+    for y in range(max(0, player_state.y - 1), min(MAP_HEIGHT, player_state.y + 2)):
+        row = GRID[y]
+        for x in range(max(0, player_state.x - 1), min(MAP_WIDTH, player_state.x + 2)):
+            for player_id in row[x]:
+                if player_id == player_state.player_id:
+                    continue
+                state = PLAYERS.get(player_id)
+                if state is not None:
+                    targets.append(state)
     return targets
 
 
 def respawn(player_state: PlayerState) -> None:
     player_state.hp = 10
-    player_state.x = random.randint(0, MAP_WIDTH - 1)
-    player_state.y = random.randint(0, MAP_HEIGHT - 1)
+    place(
+        player_state,
+        RNG.randrange(MAP_WIDTH),
+        RNG.randrange(MAP_HEIGHT),
+    )
 
 
-def ensure_bots_running() -> None:
-    global BOT_TASK_STARTED
-    if BOT_TASK_STARTED:
-        return
-    BOT_TASK_STARTED = True
+def start_bots() -> None:
+    global BOTS_STARTED
+    # Test-and-set under its own lock: exactly one caller spawns the bots.
+    with BOTS_LOCK:
+        if BOTS_STARTED:
+            return
+        BOTS_STARTED = True
     for _ in range(BOT_COUNT):
         bot_id = f"bot-{uuid4().hex[:8]}"
-        PLAYERS[bot_id] = PlayerState(
-            player_id=bot_id,
-            x=random.randint(0, MAP_WIDTH - 1),
-            y=random.randint(0, MAP_HEIGHT - 1),
-            is_bot=True,
-            display_name=random.choice(BOT_NAMES),
+        add_player(
+            PlayerState(
+                player_id=bot_id,
+                is_bot=True,
+                display_name=RNG.choice(BOT_NAMES),
+            ),
+            RNG.randrange(MAP_WIDTH),
+            RNG.randrange(MAP_HEIGHT),
         )
-    GLOBAL_STATE["players"] = len(PLAYERS)
     socketio.start_background_task(bot_loop)
 
 
 def bot_loop() -> None:
     while True:
-        time.sleep(1.5)
-        with LOCK:
-            bots = [state for state in PLAYERS.values() if state.is_bot]
-            if not bots:
-                continue
-            for bot in bots:
-                direction = random.choice(["up", "down", "left", "right"])
-                dx, dy = direction_to_delta(direction)
-                bot.x = clamp(bot.x + dx, 0, MAP_WIDTH - 1)
-                bot.y = clamp(bot.y + dy, 0, MAP_HEIGHT - 1)
-                targets = find_targets(bot)
-                for target in targets:
-                    if target.is_bot:
-                        continue
+        socketio.sleep(1.5)
+        bot_slots = np.flatnonzero(IS_BOT)
+        if not bot_slots.size:
+            continue
+        bots = [SLOT_OWNERS[slot] for slot in bot_slots]
+        directions = RNG.choices(DIRECTIONS, k=len(bots))
+        steps = np.array(
+            [DIRECTION_DELTAS[direction] for direction in directions], dtype=np.int16
+        )
+        with ExitStack() as stack:
+            for lock in PLAYERS.locks_for([bot.player_id for bot in bots]):
+                stack.enter_context(lock)
+            old_xs = POS_X[bot_slots]
+            old_ys = POS_Y[bot_slots]
+            POS_X[bot_slots] = np.clip(old_xs + steps[:, 0], 0, MAP_WIDTH - 1)
+            POS_Y[bot_slots] = np.clip(old_ys + steps[:, 1], 0, MAP_HEIGHT - 1)
+            for bot, old_x, old_y in zip(bots, old_xs.tolist(), old_ys.tolist()):
+                update_cell(bot, old_x, old_y)
+                sync_actor(bot)
+        for bot in bots:
+            for target in find_targets(bot):
+                if target.is_bot:
+                    continue
+                with PLAYERS.lock_for(target.player_id):
                     target.hp -= 1
                     if target.hp <= 0:
                         respawn(target)
+                    sync_actor(target)
         emit_world_state()
 
 
 def emit_world_state() -> None:
-    if not PLAYERS:
+    if not len(PLAYERS) or not has_listeners():
+        return
+    # Periodic full snapshot that reconciles whatever the deltas missed.
+    broadcast_batched("state", {"world": build_world()})
+
+
+def emit_delta(delta: dict) -> None:
+    global FLUSH_SCHEDULED
+    with OUTBOX_LOCK:
+        PENDING_DELTAS.append(delta)
+        if FLUSH_SCHEDULED:
+            return
+        FLUSH_SCHEDULED = True
+    socketio.start_background_task(flush_deltas)
+
+
+def flush_deltas() -> None:
+    global FLUSH_SCHEDULED
+    # Let the other events of this loop tick land in PENDING_DELTAS first.
+    socketio.sleep(0)
+    with OUTBOX_LOCK:
+        pending = PENDING_DELTAS[:]
+        PENDING_DELTAS.clear()
+        FLUSH_SCHEDULED = False
+    broadcast_batched("delta", coalesce_deltas(pending))
+
+
+def coalesce_deltas(deltas: list[dict]) -> list[dict]:
+    # Deltas carry absolute values, so only an actor's last move in a tick counts.
+    last_move = {
+        delta["id"]: index
+        for index, delta in enumerate(deltas)
+        if delta["op"] == "move"
+    }
+    return [
+        delta
+        for index, delta in enumerate(deltas)
+        if delta["op"] != "move" or last_move[delta["id"]] == index
+    ]
+
+
+def encode_event(event: str, payload: dict | list) -> str:
+    return socketio.server.packet_class(EVENT, data=[event, payload]).encode()
+
+
+def has_listeners() -> bool:
+    participants = socketio.server.manager.get_participants("/", None)
+    return next(participants, None) is not None
+
+
+def broadcast_batched(event: str, payload: dict | list) -> None:
+    participants = socketio.server.manager.get_participants("/", None)
+    eio_sids = [eio_sid for _, eio_sid in participants]
+    if not eio_sids:
+        return
+    # Serialize once and hand the same frame to every socket.
+    frame = encode_event(event, payload)
+    for start in range(0, len(eio_sids), BROADCAST_BATCH_SIZE):
+        for eio_sid in eio_sids[start : start + BROADCAST_BATCH_SIZE]:
+            send_frame(eio_sid, frame)
+        # Let connect/mutate handlers run between batches of a large fan-out.
+        socketio.sleep(0)
+
+
+def send_frame(eio_sid: str, frame: str) -> None:
+    socket = socketio.server.eio.sockets.get(eio_sid)
+    if socket is None:
+        return
+    if socket.queue.qsize() >= MAX_QUEUED_FRAMES:
+        # A slow consumer only ever costs its own backlog, never the broadcast:
+        # close without waiting for that backlog to drain.
+        socket.close(wait=False, abort=True)
         return
-    sample_state = next(iter(PLAYERS.values()))
-    socketio.emit("state", build_state(sample_state), broadcast=True)
+    socketio.server.eio.send(eio_sid, frame)
 
 
 if __name__ == "__main__":
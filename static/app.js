@@ -1,6 +1,9 @@
 const state = {
   playerId: null,
   mutations: [],
+  player: null,
+  world: null,
+  actors: new Map(),
 };
 
 const elements = {
@@ -28,15 +31,92 @@ socket.on("session", (payload) => {
 });
 
 socket.on("state", (payload) => {
-  if (payload.player && payload.player.id === state.playerId) {
-    state.mutations = payload.player.mutations;
-    renderPlayer(payload.player);
+  const player = (payload.players || []).find(
+    (item) => item.id === state.playerId
+  );
+  if (player) {
+    state.player = player;
   }
-  renderWorld(payload.world);
-  renderMap(payload.world);
-  renderEvolution();
+  state.world = payload.world;
+  state.actors = new Map(state.world.actors.map((actor) => [actor.id, actor]));
+  render();
+});
+
+socket.on("delta", (deltas) => {
+  if (!state.world) {
+    return;
+  }
+  deltas.forEach(applyDelta);
+  render();
 });
 
+function applyDelta(delta) {
+  const world = state.world;
+  if (delta.global_biomass !== undefined) {
+    world.global_biomass = delta.global_biomass;
+  }
+  if (delta.players !== undefined) {
+    world.players = delta.players;
+  }
+
+  if (delta.op === "join") {
+    removeActor(delta.actor.id);
+    world.actors.push(delta.actor);
+    state.actors.set(delta.actor.id, delta.actor);
+    return;
+  }
+  if (delta.op === "leave") {
+    removeActor(delta.id);
+    return;
+  }
+
+  const actor = state.actors.get(delta.id);
+  if (!actor) {
+    return;
+  }
+  if (delta.op === "move") {
+    actor.x = delta.x;
+    actor.y = delta.y;
+  } else if (delta.op === "hit") {
+    actor.hp = delta.hp;
+    actor.x = delta.x;
+    actor.y = delta.y;
+  } else if (delta.op === "mutate") {
+    actor.hp = delta.hp;
+    if (!actor.mutations.includes(delta.m)) {
+      actor.mutations.push(delta.m);
+    }
+    world.global_mutations[delta.m] = delta.count;
+    if (state.player && delta.id === state.playerId) {
+      state.player.biomass = delta.biomass;
+    }
+  }
+}
+
+function removeActor(actorId) {
+  if (!state.actors.delete(actorId)) {
+    return;
+  }
+  state.world.actors = state.world.actors.filter(
+    (actor) => actor.id !== actorId
+  );
+}
+
+function render() {
+  const ownActor = state.actors.get(state.playerId);
+  if (state.player && ownActor) {
+    state.player.hp = ownActor.hp;
+    state.player.mutations = ownActor.mutations;
+  }
+  if (state.player) {
+    state.mutations = state.player.mutations;
+    renderPlayer(state.player);
+  }
+  renderWorld(state.world);
+  renderMap(state.world);
+  renderEvolution();
+}
+
 function renderPlayer(player) {
   elements.playerBiomass.textContent = player.biomass;
   elements.playerMutations.textContent = player.mutations.length;